@@ -1,12 +1,24 @@
+from __future__ import annotations
+
 import io
-import pandas as pd
+import importlib
+import threading
+import time
+from typing import TYPE_CHECKING
 from flask import Flask, request, jsonify, send_from_directory, render_template_string
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
-from chat_agent import ChatAgent, ConversationState
+from chat_agent import ChatAgent
+from model_client import get_all_stats
 from datetime import datetime
 import os
 
+# pandas, pyarrow and the model client are loaded lazily (or by the background
+# warm-up) so the process can bind its port and answer /ready quickly
+if TYPE_CHECKING:
+    import pandas as pd
+    from dataset_store import DatasetStore
+
 app = Flask(__name__)
 CORS(app)
 
@@ -14,22 +26,133 @@ CORS(app)
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 ALLOWED_EXTENSIONS = {'xlsx', 'xls', 'csv'}
 
-current_dataframe: pd.DataFrame = None
-# Maintain full history stacks for robust undo/redo
-undo_stack: list[pd.DataFrame] = []
-redo_stack: list[pd.DataFrame] = []
-
-conversation_state = ConversationState()
-chat_agent = ChatAgent()
+# Current version and undo/redo history of each workspace live in memory-mapped
+# Arrow files shared by every worker process on this host
+_dataset_store: DatasetStore = None
+_chat_agent: ChatAgent = None
+_init_lock = threading.Lock()
+
+# warm-up runs once per process, started by the first request (usually the /ready
+# probe), so workers forked from a preloaded app each warm up on their own
+_warm_up_done = threading.Event()
+_warm_up_pid = None
+_warm_up_lock = threading.Lock()
+warm_up_status = {'started_at': None, 'finished_at': None, 'steps': {}, 'error': None}
+
+def get_dataset_store() -> DatasetStore:
+    global _dataset_store
+    if _dataset_store is None:
+        with _init_lock:
+            if _dataset_store is None:
+                from dataset_store import DatasetStore
+                _dataset_store = DatasetStore()
+    return _dataset_store
+
+def get_chat_agent() -> ChatAgent:
+    global _chat_agent
+    if _chat_agent is None:
+        with _init_lock:
+            if _chat_agent is None:
+                _chat_agent = ChatAgent()
+    return _chat_agent
+
+def warm_up():
+    """Pre-import heavy modules and prime the executor and model client; timings are reported by /ready"""
+    warm_up_status['started_at'] = time.time()
+    steps = [
+        ('imports', lambda: [importlib.import_module(name) for name in ('numpy', 'pandas', 'pyarrow', 'openpyxl')]),
+        ('dataset_store', get_dataset_store),
+        ('chat_agent', lambda: get_chat_agent().warm_up(preconnect=os.environ.get('GEMINI_PRECONNECT', '1') != '0')),
+    ]
+    try:
+        for name, step in steps:
+            start = time.perf_counter()
+            step()
+            warm_up_status['steps'][name] = round(time.perf_counter() - start, 3)
+    except Exception as e:
+        # requests still initialize lazily, so a failed warm-up only costs latency
+        print(f"Warm-up failed: {str(e)}")
+        warm_up_status['error'] = str(e)
+    finally:
+        warm_up_status['finished_at'] = time.time()
+        _warm_up_done.set()
+
+def start_warm_up():
+    global _warm_up_pid
+    if _warm_up_pid == os.getpid():
+        return
+    with _warm_up_lock:
+        if _warm_up_pid == os.getpid():
+            return
+        _warm_up_pid = os.getpid()
+        if os.environ.get('APP_WARMUP', '1') == '0':
+            _warm_up_done.set()
+            return
+        threading.Thread(target=warm_up, name='warm-up', daemon=True).start()
+
+def _after_fork_in_child():
+    """Drop per-process state inherited from the parent: warm-up progress, locks and pooled model sockets"""
+    global _warm_up_done, _warm_up_pid, _warm_up_lock, _init_lock, warm_up_status
+    _warm_up_done = threading.Event()
+    _warm_up_pid = None
+    _warm_up_lock = threading.Lock()
+    _init_lock = threading.Lock()
+    warm_up_status = {'started_at': None, 'finished_at': None, 'steps': {}, 'error': None}
+    if _chat_agent is not None:
+        _chat_agent.after_fork()
+    if _dataset_store is not None:
+        _dataset_store.after_fork()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+@app.before_request
+def ensure_warm_up():
+    start_warm_up()
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 def safe_to_dict(df: pd.DataFrame, orient='records'):
+    import pandas as pd
     df_clean = df.copy()
     df_clean = df_clean.where(pd.notnull(df_clean), None)
     return df_clean.to_dict(orient)
 
+def current_workspace():
+    return request.headers.get('X-Workspace') or request.args.get('workspace') or 'default'
+
+def history_counts(state):
+    return {
+        "undo_count": len(state['undo']),
+        "redo_count": len(state['redo']),
+    }
+
+def table_rows(table, start, stop):
+    """Convert only rows [start, stop) of a memory-mapped table to pandas"""
+    return table.slice(start, stop - start).to_pandas()
+
+def stringified_note(columns):
+    if not columns:
+        return None
+    return (f"Note: column(s) {', '.join(columns)} mix numbers and text, so they were stored as text. "
+            "Convert them (e.g. with pd.to_numeric) before doing numeric comparisons.")
+
+def version_summary(workspace, version):
+    dataset_store = get_dataset_store()
+    table, _ = dataset_store.table(workspace, version)
+    preview = table_rows(table, 0, 100)
+    return {
+        "result_shape": (table.num_rows, len(preview.columns)),
+        "result_columns": list(preview.columns),
+        "preview": safe_to_dict(preview),
+        "total_rows": table.num_rows,
+    }
+
+@app.errorhandler(ValueError)
+def handle_value_error(e):
+    return jsonify({'detail': str(e)}), 400
+
 @app.route('/static/<path:filename>')
 def static_files(filename):
     """Serve static files"""
@@ -47,7 +170,9 @@ def dashboard():
 
 @app.route('/upload', methods=['POST'])
 def upload_file():
-    global current_dataframe, undo_stack, redo_stack
+    import pandas as pd
+    dataset_store = get_dataset_store()
+    workspace = current_workspace()
     
     if 'file' not in request.files:
         return jsonify({'detail': 'No file provided'}), 400
@@ -63,137 +188,138 @@ def upload_file():
         filename = secure_filename(file.filename)
         
         if filename.endswith('.csv'):
-            current_dataframe = pd.read_csv(file)
+            uploaded_dataframe = pd.read_csv(file)
         else:
-            current_dataframe = pd.read_excel(file)
+            uploaded_dataframe = pd.read_excel(file)
         
-        # reset history stacks on new upload
-        undo_stack = []
-        redo_stack = []
+        # new upload starts a fresh version history
+        state = dataset_store.reset(workspace, uploaded_dataframe)
         
         return jsonify({
             "message": "File uploaded successfully",
+            "warning": stringified_note(state['stringified_columns']),
             "filename": filename,
-            "shape": current_dataframe.shape,
-            "columns": list(current_dataframe.columns),
-            "preview": safe_to_dict(current_dataframe.head(100)),
-            "total_rows": len(current_dataframe),
-            "undo_count": len(undo_stack),
-            "redo_count": len(redo_stack),
+            "shape": uploaded_dataframe.shape,
+            "columns": list(uploaded_dataframe.columns),
+            "preview": safe_to_dict(uploaded_dataframe.head(100)),
+            "total_rows": len(uploaded_dataframe),
+            **history_counts(state),
         })
     except Exception as e:
         return jsonify({'detail': f'Error processing file: {str(e)}'}), 400
 
 @app.route('/undo', methods=['POST'])
 def undo_last_transformation():
-    global current_dataframe, undo_stack, redo_stack
-    if not undo_stack:
+    dataset_store = get_dataset_store()
+    workspace = current_workspace()
+    state = dataset_store.undo(workspace)
+    if state is None:
         return jsonify({
             "success": False,
             "error": "Nothing to undo",
-            "undo_count": len(undo_stack),
-            "redo_count": len(redo_stack),
+            **history_counts(dataset_store.state(workspace)),
         })
 
-    print("Undo requested - restoring previous dataframe from stack")
-    # move current to redo, pop last undo into current
-    if current_dataframe is not None:
-        redo_stack.append(current_dataframe)
-    current_dataframe = undo_stack.pop()
-
-    current_dataframe.to_csv('data.csv', index=False)
-    print("Previous df restored and saved to data.csv file")
+    print("Undo requested - restored previous version", state['version'])
+    current_dataframe, _ = dataset_store.dataframe(workspace, state['version'], arrow_dtypes=True)
+    dataset_store.export_csv(workspace, current_dataframe)
+    print("Previous df restored and exported to the workspace data.csv")
 
     return jsonify({
         "success": True,
         "type": "transformation",
         "message": "Successfully undone last transformation",
-        "result_shape": current_dataframe.shape,
-        "result_columns": list(current_dataframe.columns),
-        "preview": safe_to_dict(current_dataframe.head(100)),
-        "total_rows": len(current_dataframe),
-        "undo_count": len(undo_stack),
-        "redo_count": len(redo_stack),
+        **version_summary(workspace, state['version']),
+        **history_counts(state),
     })
 
 @app.route('/redo', methods=['POST'])
 def redo_last_undo():
-    global current_dataframe, undo_stack, redo_stack
-    if not redo_stack:
+    dataset_store = get_dataset_store()
+    workspace = current_workspace()
+    state = dataset_store.redo(workspace)
+    if state is None:
         return jsonify({
             "success": False,
             "error": "Nothing to redo",
-            "undo_count": len(undo_stack),
-            "redo_count": len(redo_stack),
+            **history_counts(dataset_store.state(workspace)),
         })
 
-    print("Redo requested - re-applying last undone dataframe from stack")
-    # move current to undo, pop last redo into current
-    if current_dataframe is not None:
-        undo_stack.append(current_dataframe)
-        if len(undo_stack) > 50:
-            undo_stack.pop(0)
-    current_dataframe = redo_stack.pop()
-
-    current_dataframe.to_csv('data.csv', index=False)
+    print("Redo requested - re-applied version", state['version'])
+    current_dataframe, _ = dataset_store.dataframe(workspace, state['version'], arrow_dtypes=True)
+    dataset_store.export_csv(workspace, current_dataframe)
 
     return jsonify({
         "success": True,
         "type": "transformation",
         "message": "Successfully redone last undo",
-        "result_shape": current_dataframe.shape,
-        "result_columns": list(current_dataframe.columns),
-        "preview": safe_to_dict(current_dataframe.head(100)),
-        "total_rows": len(current_dataframe),
-        "undo_count": len(undo_stack),
-        "redo_count": len(redo_stack),
+        **version_summary(workspace, state['version']),
+        **history_counts(state),
     })
 
 @app.route('/chat', methods=['POST'])
 def chat_with_agent():
-    global current_dataframe, conversation_state, undo_stack, redo_stack
+    from dataset_store import VersionConflict, UnsupportedDataFrame
     try:
+        dataset_store = get_dataset_store()
+        workspace = current_workspace()
+        current_dataframe, version = dataset_store.dataframe(workspace)
+        state = dataset_store.state(workspace)
         data = request.get_json()
         message = data.get('message', '')
         model = data.get('model', 'gemini')
         
-        # record user message
-        conversation_state.messages.append({
+        # user message; persisted together with the reply once the turn succeeds
+        user_message = {
             'role': 'user',
             'content': message,
             'timestamp': datetime.now().isoformat()
-        })
+        }
+        messages = dataset_store.messages(workspace) + [user_message]
 
         # get assistant response
-        response = chat_agent.chat(
+        response = get_chat_agent().chat(
             message,
-            conversation_state.messages,
+            messages,
             current_dataframe,
             model
         )
 
-        # record assistant message
-        conversation_state.messages.append({
-            'role': 'assistant',
-            'content': response['message'],
-            'code': response.get('code'),
-            'timestamp': datetime.now().isoformat()
-        })
-
         dataframe_updated = False
         if response.get('has_code') and response.get('execution_result'):
             execution_result = response['execution_result']
             if execution_result.get('success'):
-                # push current to undo stack and clear redo
-                if current_dataframe is not None:
-                    undo_stack.append(current_dataframe.copy())
-                    if len(undo_stack) > 50:
-                        undo_stack.pop(0)
-                redo_stack = []
-
-                current_dataframe = execution_result['dataframe']
-                current_dataframe.to_csv('data.csv', index=False)
+                # publish as the next version; previous one moves onto the undo history
+                try:
+                    state = dataset_store.commit(workspace, execution_result['dataframe'], version)
+                except VersionConflict:
+                    # the reply claims the change was made, so it is not recorded
+                    return jsonify({
+                        'success': False,
+                        'error': 'The data was changed by another request. Please try again.',
+                        **history_counts(dataset_store.state(workspace)),
+                    })
+                except UnsupportedDataFrame as e:
+                    return jsonify({
+                        'success': False,
+                        'error': f'The transformation could not be saved: {str(e)}. '
+                                 'Rename or drop the duplicate columns and try again.',
+                        **history_counts(dataset_store.state(workspace)),
+                    })
+
+                dataset_store.export_csv(workspace, execution_result['dataframe'])
                 dataframe_updated = True
+                note = stringified_note(state['stringified_columns'])
+                if note:
+                    response['message'] = f"{response['message']}\n\n{note}"
+
+        # record the turn
+        dataset_store.append_messages(workspace, [user_message, {
+            'role': 'assistant',
+            'content': response['message'],
+            'code': response.get('code'),
+            'timestamp': datetime.now().isoformat()
+        }])
 
         # sanitize execution_result for response
         safe_execution_result = None
@@ -218,8 +344,7 @@ def chat_with_agent():
             'raw_response': response.get('raw_response'),
             'executed_code': response.get('executed_code'),
             'execution_result': safe_execution_result,
-            'undo_count': len(undo_stack),
-            'redo_count': len(redo_stack),
+            **history_counts(state),
         })
     except Exception as e:
         return jsonify({
@@ -229,14 +354,17 @@ def chat_with_agent():
 
 @app.route('/data')
 def get_data_page():
-    global current_dataframe, undo_stack, redo_stack
-    if current_dataframe is None:
+    dataset_store = get_dataset_store()
+    workspace = current_workspace()
+    table, version = dataset_store.table(workspace)
+    if table is None:
         return jsonify({'detail': 'No data available'}), 400
+    state = dataset_store.state(workspace)
 
     page = int(request.args.get('page', 1))
     rows_per_page = int(request.args.get('rows_per_page', 10))
     
-    total_rows = len(current_dataframe)
+    total_rows = table.num_rows
     total_pages = (total_rows + rows_per_page - 1) // rows_per_page
     if total_pages == 0:
         total_pages = 1
@@ -245,35 +373,43 @@ def get_data_page():
 
     start_idx = (page - 1) * rows_per_page
     end_idx = min(start_idx + rows_per_page, total_rows)
-    page_data = current_dataframe.iloc[start_idx:end_idx]
+    page_data = table_rows(table, start_idx, end_idx)
 
     return jsonify({
         "data": safe_to_dict(page_data),
-        "columns": list(current_dataframe.columns),
+        "columns": list(page_data.columns),
         "current_page": page,
         "total_pages": total_pages,
         "total_rows": total_rows,
         "rows_per_page": rows_per_page,
         "start_row": start_idx + 1,
         "end_row": end_idx,
-        "undo_count": len(undo_stack),
-        "redo_count": len(redo_stack),
+        **history_counts(state),
     })
 
 @app.route('/chat/history')
 def get_chat_history():
-    global conversation_state
+    messages = get_dataset_store().messages(current_workspace())
     return jsonify({
-        'messages': conversation_state.messages[-20:],
-        'total_messages': len(conversation_state.messages)
+        'messages': messages[-20:],
+        'total_messages': len(messages)
     })
 
 @app.route('/chat/clear', methods=['POST'])
 def clear_chat_history():
-    global conversation_state
-    conversation_state.messages = []
+    get_dataset_store().clear_messages(current_workspace())
     return jsonify({'success': True, 'message': 'Chat history cleared'})
 
+@app.route('/ready')
+def readiness():
+    if not _warm_up_done.is_set():
+        return jsonify({'ready': False, 'warm_up': warm_up_status}), 503
+    return jsonify({'ready': True, 'warm_up': warm_up_status})
+
+@app.route('/model/stats')
+def get_model_stats():
+    return jsonify(get_all_stats())
+
 @app.route('/')
 def landing_page():
     """Serve the React landing page"""
@@ -0,0 +1,102 @@
+"""Cold-start benchmark: import time and time-to-first-request of app.py.
+
+Every run starts a fresh interpreter so nothing is cached between runs. Chat
+requests go to stub_model_server, so no API key or network is needed.
+
+    python benchmark.py --runs 5
+    python benchmark.py --runs 5 --no-warmup
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+SAMPLE_CSV = b"Student_Name,Total_Score,Attendance\nEmma,83.5,92\nLiam,71.0,80\nAva,64.2,70\n"
+
+
+def child(wait_ready: bool):
+    """Runs inside the fresh interpreter; prints one JSON line of timings in milliseconds."""
+    import io
+    start = time.perf_counter()
+    import app
+    timings = {'import_ms': (time.perf_counter() - start) * 1000}
+    client = app.app.test_client()
+
+    if wait_ready:
+        while client.get('/ready').status_code != 200:
+            time.sleep(0.005)
+        timings['ready_ms'] = (time.perf_counter() - start) * 1000
+
+    def timed(name, call):
+        t = time.perf_counter()
+        response = call()
+        timings[f'{name}_ms'] = (time.perf_counter() - t) * 1000
+        assert response.status_code == 200, (name, response.status_code, response.get_data(as_text=True))
+        return response
+
+    timed('first_upload', lambda: client.post('/upload', data={'file': (io.BytesIO(SAMPLE_CSV), 'sample.csv')}))
+    timed('first_data', lambda: client.get('/data?page=1&rows_per_page=10'))
+    timed('first_chat', lambda: client.post('/chat', json={'message': 'Who has the highest score?'}))
+    # from the start of `import app` until the first request has been answered
+    timings['time_to_first_request_ms'] = timings.get('ready_ms', timings['import_ms']) + timings['first_upload_ms']
+    timings['total_ms'] = (time.perf_counter() - start) * 1000
+    print(json.dumps(timings))
+
+
+def run_once(warm_up: bool, wait_ready: bool, base_url: str) -> dict:
+    env = dict(os.environ)
+    env.update({
+        'APP_WARMUP': '1' if warm_up else '0',
+        'GEMINI_BASE_URL': base_url,
+        'GEMINI_API_KEY': 'stub-key',
+        'DATASET_STORE_DIR': tempfile.mkdtemp(prefix='bench-datasets-'),
+    })
+    args = [sys.executable, os.path.abspath(__file__), '--child']
+    if wait_ready:
+        args.append('--wait-ready')
+    started = time.perf_counter()
+    result = subprocess.run(args, cwd=HERE, env=env, capture_output=True, text=True, check=True)
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings['process_ms'] = (time.perf_counter() - started) * 1000
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time and time-to-first-request")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--no-warmup', action='store_true', help="disable the background warm-up (APP_WARMUP=0)")
+    parser.add_argument('--no-wait-ready', action='store_true', help="send the first request without waiting for /ready")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--wait-ready', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.wait_ready)
+        return
+
+    sys.path.insert(0, HERE)
+    from stub_model_server import StubConfig, start_stub_server
+    reply = ("Emma has the highest score.\n<query_code>\n"
+             "print(df.loc[df['Total_Score'].idxmax(), 'Student_Name'])\n</query_code>")
+    server = start_stub_server(StubConfig(reply=reply))
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    runs = [run_once(not args.no_warmup, not args.no_wait_ready, base_url) for _ in range(args.runs)]
+
+    print(f"warm-up: {'off' if args.no_warmup else 'on'}, "
+          f"wait for /ready: {'no' if args.no_wait_ready else 'yes'}, runs: {args.runs}")
+    for key in runs[0]:
+        values = [run[key] for run in runs]
+        print(f"  {key:<26} median {statistics.median(values):8.1f} ms   "
+              f"min {min(values):8.1f}   max {max(values):8.1f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,47 @@
+from __future__ import annotations
+
 import re
 import io
 import time
 import traceback
-import numpy as np
-import pandas as pd
-from typing import Tuple, Any, Dict, List
+from typing import Tuple, Any, Dict, List, TYPE_CHECKING
 from contextlib import redirect_stdout, redirect_stderr
 
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Exercised once by warm_up() so pandas' lazily imported internals are loaded before the first request
+WARM_UP_CODE = """
+summary = df.groupby('group')['value'].agg(['mean', 'sum', 'count'])
+df = df.sort_values(by='value', ascending=False)
+df['flag'] = np.where(df['value'] > 1, 'high', 'low')
+df['label'] = df['group'].str.upper()
+print(summary.to_string())
+print(df.describe().to_string())
+"""
+
+def _exec_globals(df: pd.DataFrame) -> Dict[str, Any]:
+    import numpy as np
+    import pandas as pd
+    return {
+        'df': df.copy(),
+        'pd': pd,
+        'np': np,
+        'pandas': pd,
+        'numpy': np
+    }
+
 class CodeExecutor:
     def __init__(self):
         pass
         
+    def warm_up(self):
+        """Import pandas/numpy and run representative code through both execution paths"""
+        import pandas as pd
+        df = pd.DataFrame({'group': ['a', 'b', 'a'], 'value': [1.0, 2.0, 3.0]})
+        self.execute_code(WARM_UP_CODE, df)
+        self.execute_query_code(WARM_UP_CODE, df)
+    
     
     def execute_code(self, code: str, df: pd.DataFrame) -> Tuple[pd.DataFrame, str]:
         start_time = time.time()
@@ -34,13 +65,7 @@ class CodeExecutor:
     def execute_query_code(self, code: str, df: pd.DataFrame) -> Tuple[str, str]:
         """Execute query code and return the output string and execution log"""
         try:
-            globals_dict = {
-                'df': df.copy(),
-                'pd': pd,
-                'np': np,
-                'pandas': pd,
-                'numpy': np
-            }
+            globals_dict = _exec_globals(df)
             locals_dict = {'df': df.copy()}
             
             stdout_capture = io.StringIO()
@@ -67,13 +92,7 @@ class CodeExecutor:
     
     def _execute_code(self, code: str, df: pd.DataFrame) -> Tuple[pd.DataFrame, str]:
         # No restrictions - allow any code
-        globals_dict = {
-            'df': df.copy(),
-            'pd': pd,
-            'np': np,
-            'pandas': pd,
-            'numpy': np
-        }
+        globals_dict = _exec_globals(df)
         locals_dict = {'df': df.copy()}
         
         stdout_capture = io.StringIO()
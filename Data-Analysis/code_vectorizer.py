@@ -0,0 +1,558 @@
+from __future__ import annotations
+
+import ast
+import time
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Rough speedups of the vectorized form over the row-wise one on large frames.
+ESTIMATED_SPEEDUPS = {
+    'iterrows': 100.0,
+    'itertuples': 10.0,
+    'apply_axis1': 30.0,
+    'loop_append': 20.0,
+    'comprehension': 20.0,
+    'concat_in_loop': 50.0,
+}
+
+UFUNCS = {'abs', 'sqrt', 'log', 'log10', 'log2', 'exp', 'floor', 'ceil', 'round', 'sign', 'isnan'}
+STR_METHODS = {'lower', 'upper', 'strip', 'lstrip', 'rstrip', 'title', 'capitalize', 'startswith',
+               'endswith', 'replace', 'split', 'zfill'}
+CASTS = {'str': 'str', 'float': 'float', 'int': 'int', 'bool': 'bool'}
+SERIES_ATTRS = {'name', 'index', 'values', 'shape', 'size', 'dtype', 'T', 'Index'}
+
+
+class SlowPattern:
+    def __init__(self, kind: str, lineno: int, message: str, rewritten: bool = False):
+        self.kind = kind
+        self.lineno = lineno
+        self.message = message
+        self.rewritten = rewritten
+
+    def __repr__(self):
+        return f"SlowPattern({self.kind!r}, line {self.lineno}, rewritten={self.rewritten})"
+
+
+class VectorizationReport:
+    def __init__(self, code: str):
+        self.code = code
+        self.findings: List[SlowPattern] = []
+        self.rewritten_code: Optional[str] = None
+
+    @property
+    def has_findings(self) -> bool:
+        return bool(self.findings)
+
+    @property
+    def remaining(self) -> List[SlowPattern]:
+        return [f for f in self.findings if not f.rewritten]
+
+    @property
+    def estimated_speedup(self) -> float:
+        if not self.findings:
+            return 1.0
+        return max(ESTIMATED_SPEEDUPS.get(f.kind, 1.0) for f in self.findings)
+
+    def summary(self) -> str:
+        return "; ".join(f"line {f.lineno}: {f.message}{' (rewritten)' if f.rewritten else ''}"
+                         for f in self.findings)
+
+
+def _frame_column(frame: str, column: str) -> ast.expr:
+    return ast.Subscript(value=ast.Name(id=frame, ctx=ast.Load()), slice=ast.Constant(value=column), ctx=ast.Load())
+
+
+def _call(func: ast.expr, args: List[ast.expr], keywords: Optional[List[ast.keyword]] = None) -> ast.Call:
+    return ast.Call(func=func, args=args, keywords=keywords or [])
+
+
+def _attr(value: ast.expr, *names: str) -> ast.expr:
+    for name in names:
+        value = ast.Attribute(value=value, attr=name, ctx=ast.Load())
+    return value
+
+
+def _as_series(node: ast.expr, frame: str) -> ast.expr:
+    """Wrap an ndarray-producing expression so downstream pandas methods keep working."""
+    return _call(_attr(ast.Name(id='pd', ctx=ast.Load()), 'Series'), [node],
+                 [ast.keyword(arg='index', value=_attr(ast.Name(id=frame, ctx=ast.Load()), 'index'))])
+
+
+class _RowExpr:
+    """Translates a per-row expression into a column-wise one.
+
+    ``row['col']`` (and ``row.col``) become ``frame['col']``; everything else must
+    be scalar or composed of operations pandas/numpy broadcast element-wise.
+    Returns None from ``translate`` when the expression can't be vectorized.
+    """
+
+    def __init__(self, row: str, frame: str, positional: bool = False):
+        self.row = row
+        self.frame = frame
+        self.positional = positional
+
+    def translate(self, node: ast.expr) -> Optional[ast.expr]:
+        result = self._visit(node)
+        if result is None:
+            return None
+        translated, vectorized = result
+        return translated if vectorized else None
+
+    def _visit(self, node: ast.expr) -> Optional[Tuple[ast.expr, bool]]:
+        method = getattr(self, f"_visit_{type(node).__name__}", None)
+        if method is None:
+            return None
+        return method(node)
+
+    def _visit_Constant(self, node):
+        return node, False
+
+    def _visit_List(self, node):
+        if self.mentions_row(node):
+            return None
+        return node, False
+
+    _visit_Tuple = _visit_List
+    _visit_Set = _visit_List
+
+    def _visit_Name(self, node):
+        if node.id == self.row:
+            return None
+        return node, False
+
+    def _visit_Subscript(self, node):
+        if isinstance(node.value, ast.Name) and node.value.id == self.row:
+            key = node.slice
+            if isinstance(key, ast.Constant) and isinstance(key.value, str) and not self.positional:
+                return _frame_column(self.frame, key.value), True
+            return None
+        if self.mentions_row(node):
+            return None
+        return node, False
+
+    def _visit_Attribute(self, node):
+        if isinstance(node.value, ast.Name) and node.value.id == self.row:
+            if node.attr in SERIES_ATTRS or node.attr.startswith('_'):
+                return None
+            return _frame_column(self.frame, node.attr), True
+        if self.mentions_row(node):
+            return None
+        return node, False
+
+    def _visit_BinOp(self, node):
+        left, right = self._visit(node.left), self._visit(node.right)
+        if left is None or right is None:
+            return None
+        return ast.BinOp(left=left[0], op=node.op, right=right[0]), left[1] or right[1]
+
+    def _visit_UnaryOp(self, node):
+        operand = self._visit(node.operand)
+        if operand is None:
+            return None
+        if isinstance(node.op, ast.Not):
+            if not operand[1]:
+                return ast.UnaryOp(op=node.op, operand=operand[0]), False
+            if not self.is_boolean(node.operand):
+                return None
+            return ast.UnaryOp(op=ast.Invert(), operand=operand[0]), True
+        return ast.UnaryOp(op=node.op, operand=operand[0]), operand[1]
+
+    def _visit_BoolOp(self, node):
+        parts = [self._visit(value) for value in node.values]
+        if any(p is None for p in parts):
+            return None
+        if not any(p[1] for p in parts):
+            return ast.BoolOp(op=node.op, values=[p[0] for p in parts]), False
+        if not all(self.is_boolean(value) for value in node.values):
+            return None
+        op = ast.BitAnd() if isinstance(node.op, ast.And) else ast.BitOr()
+        result = parts[0][0]
+        for part in parts[1:]:
+            result = ast.BinOp(left=result, op=op, right=part[0])
+        return result, True
+
+    def _visit_Compare(self, node):
+        operands = [self._visit(node.left)] + [self._visit(c) for c in node.comparators]
+        if any(o is None for o in operands):
+            return None
+        if not any(o[1] for o in operands):
+            return node, False
+
+        pieces = []
+        for i, op in enumerate(node.ops):
+            left, right = operands[i], operands[i + 1]
+            if isinstance(op, (ast.Is, ast.IsNot)):
+                return None
+            if isinstance(op, (ast.In, ast.NotIn)):
+                if not left[1] or right[1]:
+                    return None
+                piece = _call(_attr(left[0], 'isin'), [right[0]])
+                if isinstance(op, ast.NotIn):
+                    piece = ast.UnaryOp(op=ast.Invert(), operand=piece)
+            else:
+                piece = ast.Compare(left=left[0], ops=[op], comparators=[right[0]])
+            pieces.append(piece)
+
+        result = pieces[0]
+        for piece in pieces[1:]:
+            result = ast.BinOp(left=result, op=ast.BitAnd(), right=piece)
+        return result, True
+
+    def _visit_IfExp(self, node):
+        test, body, orelse = self._visit(node.test), self._visit(node.body), self._visit(node.orelse)
+        if test is None or body is None or orelse is None:
+            return None
+        if not test[1]:
+            return ast.IfExp(test=test[0], body=body[0], orelse=orelse[0]), body[1] or orelse[1]
+        if not self.is_boolean(node.test):
+            return None
+        where = _call(_attr(ast.Name(id='np', ctx=ast.Load()), 'where'), [test[0], body[0], orelse[0]])
+        return _as_series(where, self.frame), True
+
+    def _visit_Call(self, node):
+        if node.keywords and any(kw.arg is None for kw in node.keywords):
+            return None
+        args = [self._visit(a) for a in node.args]
+        keywords = [(kw.arg, self._visit(kw.value)) for kw in node.keywords]
+        if any(a is None for a in args) or any(v is None for _, v in keywords):
+            return None
+        vectorized = any(a[1] for a in args) or any(v[1] for _, v in keywords)
+        if not vectorized:
+            if self.mentions_row(node.func):
+                return self._visit_method(node, args, keywords)
+            return node, False
+
+        func = node.func
+        new_keywords = [ast.keyword(arg=k, value=v[0]) for k, v in keywords]
+
+        # builtins: abs/round/min/max/len/str/float/int
+        if isinstance(func, ast.Name):
+            if func.id == 'abs' and len(args) == 1:
+                return _call(_attr(ast.Name(id='np', ctx=ast.Load()), 'abs'), [args[0][0]]), True
+            if func.id == 'round' and 1 <= len(args) <= 2 and not new_keywords:
+                rounded = _call(_attr(args[0][0], 'round'), [a[0] for a in args[1:]])
+                if len(args) == 1:
+                    # round(x) returns an int (and raises on NaN); Series.round() keeps floats
+                    rounded = _call(_attr(rounded, 'astype'), [ast.Name(id='int', ctx=ast.Load())])
+                return rounded, True
+            if func.id in ('min', 'max') and len(args) == 2 and not new_keywords:
+                name = 'minimum' if func.id == 'min' else 'maximum'
+                return _call(_attr(ast.Name(id='np', ctx=ast.Load()), name), [a[0] for a in args]), True
+            if func.id == 'len' and len(args) == 1 and args[0][1]:
+                return _call(_attr(args[0][0], 'str', 'len'), []), True
+            if func.id in CASTS and len(args) == 1 and args[0][1]:
+                return _call(_attr(args[0][0], 'astype'), [ast.Name(id=CASTS[func.id], ctx=ast.Load())]), True
+            return None
+
+        # numpy ufuncs and pd.isna/notna already broadcast over Series
+        if isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name):
+            if func.value.id in ('np', 'numpy') and func.attr in UFUNCS:
+                return _call(func, [a[0] for a in args], new_keywords), True
+            if func.value.id in ('pd', 'pandas') and func.attr in ('isna', 'isnull', 'notna', 'notnull'):
+                return _call(func, [a[0] for a in args], new_keywords), True
+        return None
+
+    def _visit_method(self, node, args, keywords):
+        """``row['col'].lower()`` style string methods become ``frame['col'].str.lower()``."""
+        func = node.func
+        if not isinstance(func, ast.Attribute) or func.attr not in STR_METHODS:
+            return None
+        receiver = self._visit(func.value)
+        if receiver is None or not receiver[1]:
+            return None
+        new_keywords = [ast.keyword(arg=k, value=v[0]) for k, v in keywords]
+        if func.attr == 'replace':
+            new_keywords.append(ast.keyword(arg='regex', value=ast.Constant(value=False)))
+        return _call(_attr(receiver[0], 'str', func.attr), [a[0] for a in args], new_keywords), True
+
+    def is_boolean(self, node: ast.expr) -> bool:
+        if isinstance(node, (ast.Compare, ast.BoolOp)):
+            return True
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            return True
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+            return node.func.attr in ('isna', 'isnull', 'notna', 'notnull', 'startswith', 'endswith', 'isnan')
+        return False
+
+    def mentions_row(self, node: ast.AST) -> bool:
+        return any(isinstance(n, ast.Name) and n.id == self.row for n in ast.walk(node))
+
+
+def _is_axis1(call: ast.Call) -> bool:
+    for kw in call.keywords:
+        if kw.arg == 'axis' and isinstance(kw.value, ast.Constant) and kw.value.value in (1, 'columns'):
+            return True
+    return False
+
+
+def _loop_source(node: ast.For) -> Optional[Tuple[str, ast.expr]]:
+    """Return ('iterrows' | 'itertuples', frame expr) if the loop walks a DataFrame row by row."""
+    it = node.iter
+    if isinstance(it, ast.Call) and isinstance(it.func, ast.Attribute) and it.func.attr in ('iterrows', 'itertuples'):
+        return it.func.attr, it.func.value
+    return None
+
+
+def _is_row_source(node: ast.expr) -> bool:
+    """Whether iterating ``node`` walks a frame element by element.
+
+    Matches ``range(len(x))``, ``range(x.shape[0])``, ``x.index``, a column ``x['col']``
+    (optionally ``.values``/``.tolist()``/``.items()``) and ``zip()`` over any of these.
+    """
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+        if node.func.id == 'range' and len(node.args) == 1:
+            bound = node.args[0]
+            if isinstance(bound, ast.Call) and isinstance(bound.func, ast.Name) and bound.func.id == 'len':
+                return True
+            return (isinstance(bound, ast.Subscript) and isinstance(bound.value, ast.Attribute)
+                    and bound.value.attr == 'shape' and isinstance(bound.slice, ast.Constant)
+                    and bound.slice.value == 0)
+        if node.func.id in ('zip', 'enumerate'):
+            return any(_is_row_source(arg) for arg in node.args)
+        return False
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and not node.args:
+        if node.func.attr in ('tolist', 'to_list', 'items'):
+            return _is_row_source(node.func.value)
+        return False
+    if isinstance(node, ast.Attribute):
+        if node.attr == 'index' and isinstance(node.value, ast.Name):
+            return True
+        if node.attr == 'values':
+            return _is_row_source(node.value)
+        return False
+    return (isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name)
+            and isinstance(node.slice, ast.Constant) and isinstance(node.slice.value, str))
+
+
+def _append_target(stmt: ast.stmt) -> Optional[Tuple[ast.expr, ast.expr]]:
+    """Match ``target.append(value)`` and return (target, value)."""
+    if (isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Call)
+            and isinstance(stmt.value.func, ast.Attribute) and stmt.value.func.attr == 'append'
+            and len(stmt.value.args) == 1 and not stmt.value.keywords):
+        return stmt.value.func.value, stmt.value.args[0]
+    return None
+
+
+class _Rewriter(ast.NodeTransformer):
+    def __init__(self, report: VectorizationReport):
+        self.report = report
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        func = node.func
+        if not (isinstance(func, ast.Attribute) and func.attr == 'apply' and _is_axis1(node)):
+            return node
+
+        finding = SlowPattern('apply_axis1', node.lineno, "row-wise DataFrame.apply(axis=1)")
+        self.report.findings.append(finding)
+
+        if (isinstance(func.value, ast.Name) and len(node.args) == 1 and isinstance(node.args[0], ast.Lambda)
+                and len(node.args[0].args.args) == 1 and len(node.keywords) == 1):
+            lam = node.args[0]
+            vectorized = _RowExpr(lam.args.args[0].arg, func.value.id).translate(lam.body)
+            if vectorized is not None:
+                finding.rewritten = True
+                return ast.copy_location(vectorized, node)
+        return node
+
+    def visit_For(self, node):
+        self.generic_visit(node)
+        source = _loop_source(node)
+
+        if source is None:
+            self._check_generic_loop(node)
+            return node
+
+        kind, frame = source
+        finding = SlowPattern(kind, node.lineno, f"row-by-row loop over DataFrame.{kind}()")
+        self.report.findings.append(finding)
+
+        if node.orelse or len(node.body) != 1 or not isinstance(frame, ast.Name):
+            return node
+
+        if kind == 'iterrows':
+            if not (isinstance(node.target, ast.Tuple) and len(node.target.elts) == 2
+                    and all(isinstance(e, ast.Name) for e in node.target.elts)):
+                return node
+            index_name, row_name = node.target.elts[0].id, node.target.elts[1].id
+            translator = _RowExpr(row_name, frame.id)
+        else:
+            if not isinstance(node.target, ast.Name):
+                return node
+            index_name, row_name = None, node.target.id
+            translator = _RowExpr(row_name, frame.id, positional=True)
+
+        replacement = self._rewrite_body(node.body[0], frame.id, index_name, translator)
+        if replacement is None:
+            return node
+        finding.rewritten = True
+        return [ast.copy_location(stmt, node) for stmt in replacement]
+
+    def _rewrite_body(self, stmt: ast.stmt, frame: str, index_name: Optional[str],
+                      translator: _RowExpr) -> Optional[List[ast.stmt]]:
+        mask = None
+        # the loop index is unbound (or stale) once the loop is gone, so it may only
+        # appear as the row label of a .at/.loc assignment
+        if isinstance(stmt, ast.If) and not stmt.orelse and len(stmt.body) == 1:
+            if index_name and index_name in _names(stmt.test):
+                return None
+            mask = translator.translate(stmt.test)
+            if mask is None or not translator.is_boolean(stmt.test):
+                return None
+            stmt = stmt.body[0]
+
+        # lst.append(expr)  ->  lst.extend(<vectorized expr>[mask].tolist())
+        append = _append_target(stmt)
+        if append is not None:
+            target, value = append
+            if translator.mentions_row(target) or (index_name and index_name in _names(stmt)):
+                return None
+            vectorized = translator.translate(value)
+            if vectorized is None:
+                return None
+            values = _as_series(vectorized, frame)
+            if mask is not None:
+                values = ast.Subscript(value=values, slice=mask, ctx=ast.Load())
+            extend = _call(_attr(target, 'extend'), [_call(_attr(values, 'tolist'), [])])
+            return [ast.Expr(value=extend)]
+
+        # frame.at[i, 'col'] = expr / frame.loc[i, 'col'] = expr  ->  frame['col'] = <vectorized expr>
+        if (mask is None and index_name and isinstance(stmt, ast.Assign) and len(stmt.targets) == 1
+                and isinstance(stmt.targets[0], ast.Subscript)):
+            target = stmt.targets[0]
+            key = target.slice
+            if (isinstance(target.value, ast.Attribute) and target.value.attr in ('at', 'loc')
+                    and isinstance(target.value.value, ast.Name) and target.value.value.id == frame
+                    and isinstance(key, ast.Tuple) and len(key.elts) == 2
+                    and isinstance(key.elts[0], ast.Name) and key.elts[0].id == index_name
+                    and isinstance(key.elts[1], ast.Constant) and isinstance(key.elts[1].value, str)
+                    and index_name not in _names(stmt.value)):
+                vectorized = translator.translate(stmt.value)
+                if vectorized is None:
+                    return None
+                column = ast.Subscript(value=ast.Name(id=frame, ctx=ast.Load()), slice=key.elts[1], ctx=ast.Store())
+                return [ast.Assign(targets=[column], value=vectorized, lineno=stmt.lineno)]
+        return None
+
+    def _check_generic_loop(self, node: ast.For):
+        for stmt in ast.walk(node):
+            if stmt is node:
+                continue
+            if (isinstance(stmt, ast.Call) and isinstance(stmt.func, ast.Attribute) and stmt.func.attr == 'concat'
+                    and isinstance(stmt.func.value, ast.Name) and stmt.func.value.id in ('pd', 'pandas')):
+                self.report.findings.append(SlowPattern('concat_in_loop', node.lineno, "pd.concat inside a loop"))
+                return
+        if _is_row_source(node.iter) and any(_append_target(s) for s in ast.walk(node) if isinstance(s, ast.stmt)):
+            self.report.findings.append(SlowPattern(
+                'loop_append', node.lineno, f"Python loop over {ast.unparse(node.iter)} appending to a list"))
+
+    def visit_ListComp(self, node):
+        self.generic_visit(node)
+        for generator in node.generators:
+            if _is_row_source(generator.iter):
+                self.report.findings.append(SlowPattern(
+                    'comprehension', node.lineno, f"comprehension over {ast.unparse(generator.iter)}"))
+                break
+        return node
+
+    visit_SetComp = visit_ListComp
+    visit_DictComp = visit_ListComp
+    visit_GeneratorExp = visit_ListComp
+
+
+def _names(node: ast.AST) -> set:
+    return {n.id for n in ast.walk(node) if isinstance(n, ast.Name)}
+
+
+def analyze_code(code: str) -> VectorizationReport:
+    """Detect row-wise pandas patterns and rewrite the ones with a safe vectorized equivalent."""
+    report = VectorizationReport(code)
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return report
+
+    tree = _Rewriter(report).visit(tree)
+    if any(f.rewritten for f in report.findings):
+        ast.fix_missing_locations(tree)
+        report.rewritten_code = ast.unparse(tree)
+    return report
+
+
+def build_vectorize_prompt(code: str, report: VectorizationReport, df_info: str, is_query: bool) -> str:
+    tag = 'query_code' if is_query else 'execute_code'
+    issues = "\n".join(f"- line {f.lineno}: {f.message}" for f in report.remaining)
+    return f"""The following pandas code is correct but uses slow row-by-row patterns that will be very slow on this dataframe.
+
+DATAFRAME INFO:
+{df_info}
+
+SLOW PATTERNS FOUND:
+{issues}
+
+CODE:
+{code}
+
+Rewrite it using vectorized pandas/numpy operations (column arithmetic, np.where, np.select, .str/.dt accessors, groupby, merge, isin) instead of iterrows, itertuples, apply(axis=1) or Python loops.
+Keep exactly the same behavior: same printed output, same variable names and the same final 'df'.
+Reply with ONLY the rewritten code inside <{tag}> tags."""
+
+
+def _failed(log: str) -> bool:
+    return 'error:' in log.lower() or 'traceback' in log.lower()
+
+
+def _sample(df: pd.DataFrame, sample_rows: int) -> pd.DataFrame:
+    """The first and last ``sample_rows // 2`` rows plus up to as many rows that contain nulls, in frame order."""
+    import numpy as np
+    if len(df) <= sample_rows:
+        return df
+    half = max(sample_rows // 2, 1)
+    null_rows = np.flatnonzero(df.isna().any(axis=1).to_numpy())[:half]
+    positions = np.union1d(np.r_[0:half, len(df) - half:len(df)], null_rows)
+    return df.iloc[positions]
+
+
+def compare_on_sample(executor, original: str, candidate: str, df: pd.DataFrame, is_query: bool,
+                      sample_rows: int = 200) -> Dict:
+    """Run both versions on a sample of ``df``; report whether they agree and how long each took.
+
+    The sample covers the head, the tail and rows with missing values, where
+    row-wise and vectorized code most often diverge.
+    """
+    import pandas as pd
+    sample = _sample(df, sample_rows)
+    timings = []
+    results = []
+    for code in (original, candidate):
+        start = time.perf_counter()
+        if is_query:
+            output, log = executor.execute_query_code(code, sample)
+        else:
+            output, log = executor.execute_code(code, sample)
+        timings.append(time.perf_counter() - start)
+        if _failed(log):
+            return {'equivalent': False, 'reason': log.splitlines()[0] if log else 'execution failed'}
+        results.append(output)
+
+    if is_query:
+        equivalent = results[0] == results[1]
+    else:
+        try:
+            # a changed dtype (64 -> 64.0) is a visible change in the table
+            pd.testing.assert_frame_equal(results[0], results[1])
+            equivalent = True
+        except AssertionError:
+            equivalent = False
+
+    original_time, candidate_time = timings
+    return {
+        'equivalent': equivalent,
+        'reason': None if equivalent else 'results differ on sample',
+        'sample_rows': len(sample),
+        'original_time': original_time,
+        'candidate_time': candidate_time,
+        'speedup': original_time / candidate_time if candidate_time > 0 else None,
+    }
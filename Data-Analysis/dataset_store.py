@@ -0,0 +1,339 @@
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+WORKSPACE_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+class UnsupportedDataFrame(ValueError):
+    """Raised when a DataFrame can't be stored as an Arrow table (e.g. duplicate column names)."""
+
+
+class VersionConflict(Exception):
+    """Raised when another worker committed a new version since the caller read theirs."""
+
+    def __init__(self, workspace: str, expected: Optional[int], actual: Optional[int]):
+        super().__init__(f"Workspace '{workspace}' is at version {actual}, expected {expected}")
+        self.workspace = workspace
+        self.expected = expected
+        self.actual = actual
+
+
+def default_store_dir() -> str:
+    # /dev/shm is RAM-backed on Linux, so mapped versions never touch disk
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(base, 'hackuta-datasets')
+
+
+class DatasetStore:
+    """Versioned per-workspace DataFrames stored as Arrow IPC files and read through memory maps.
+
+    Every committed version is an immutable ``v<n>.arrow`` file. A workspace's
+    ``state.json`` names the current version plus the undo/redo stacks (as version
+    numbers), and is only replaced under an inter-process file lock. Worker processes
+    on the same host map the same files. ``table()`` and ``dataframe(arrow_dtypes=True)``
+    read a version without copying it into each worker; ``dataframe()`` converts it to
+    an ordinary numpy-backed frame (NaN for missing values), which is what generated
+    code expects, so that path costs one copy per request.
+
+    ``frame_cache_size`` keeps that many materialized DataFrames per process; it
+    defaults to 0 since building one from the mapped table is cheap.
+
+    Readers take no lock, so a version that drops out of the history is only deleted
+    ``gc_grace`` seconds later; a reader holding the previous ``state.json`` can still
+    map it in the meantime.
+    """
+
+    MAX_MESSAGES = 200
+
+    def __init__(self, root: Optional[str] = None, max_history: int = 50, cache_size: int = 4,
+                 frame_cache_size: Optional[int] = None, gc_grace: float = 30.0):
+        self.root = root or os.environ.get('DATASET_STORE_DIR') or default_store_dir()
+        self.max_history = max_history
+        self.cache_size = cache_size
+        if frame_cache_size is None:
+            frame_cache_size = int(os.environ.get('DATASET_FRAME_CACHE', 0))
+        self.frame_cache_size = frame_cache_size
+        self.gc_grace = gc_grace
+        os.makedirs(self.root, exist_ok=True)
+        self._cache_lock = threading.Lock()
+        self._tables: 'OrderedDict[Tuple[str, int], pa.Table]' = OrderedDict()
+        self._frames: 'OrderedDict[Tuple[str, int, bool], pd.DataFrame]' = OrderedDict()
+
+    def after_fork(self):
+        """Mapped tables stay valid in a forked child; only the cache lock may have been held mid-fork."""
+        self._cache_lock = threading.Lock()
+
+    # ---- paths and state -------------------------------------------------
+
+    def _workspace_dir(self, workspace: str) -> str:
+        if not WORKSPACE_PATTERN.match(workspace or ''):
+            raise ValueError(f"Invalid workspace name: {workspace!r}")
+        path = os.path.join(self.root, workspace)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def _version_path(self, workspace: str, version: int) -> str:
+        return os.path.join(self._workspace_dir(workspace), f"v{version}.arrow")
+
+    def state(self, workspace: str) -> Dict[str, Any]:
+        path = os.path.join(self._workspace_dir(workspace), 'state.json')
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'version': None, 'next_version': 1, 'undo': [], 'redo': []}
+
+    def _write_json(self, workspace: str, name: str, data: Any):
+        directory = self._workspace_dir(workspace)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.json')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, os.path.join(directory, name))
+
+    def _write_state(self, workspace: str, state: Dict[str, Any]):
+        self._write_json(workspace, 'state.json', state)
+
+    @contextmanager
+    def _locked(self, workspace: str):
+        lock_path = os.path.join(self._workspace_dir(workspace), '.lock')
+        with open(lock_path, 'a+b') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                else:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    # ---- reads -----------------------------------------------------------
+
+    def table(self, workspace: str, version: Optional[int] = None) -> Tuple[Optional[pa.Table], Optional[int]]:
+        """Return the memory-mapped Arrow table for ``version`` (default: current) without copying."""
+        if version is not None:
+            return self._map_version(workspace, version), version
+
+        for attempt in range(3):
+            version = self.state(workspace)['version']
+            if version is None:
+                return None, None
+            try:
+                return self._map_version(workspace, version), version
+            except FileNotFoundError:
+                # collected after we read a stale state.json; the new state names a live version
+                if attempt == 2:
+                    raise
+
+    def _map_version(self, workspace: str, version: int) -> pa.Table:
+        key = (workspace, version)
+        with self._cache_lock:
+            if key in self._tables:
+                self._tables.move_to_end(key)
+                return self._tables[key]
+
+        source = pa.memory_map(self._version_path(workspace, version), 'r')
+        table = pa.ipc.open_file(source).read_all()
+
+        with self._cache_lock:
+            self._tables[key] = table
+            while len(self._tables) > self.cache_size:
+                self._tables.popitem(last=False)
+        return table
+
+    def dataframe(self, workspace: str, version: Optional[int] = None,
+                  arrow_dtypes: bool = False) -> Tuple[Optional[pd.DataFrame], Optional[int]]:
+        """Return a version as a pandas DataFrame; callers must not mutate it.
+
+        ``arrow_dtypes=True`` wraps the mapped buffers without copying, but missing values
+        become ``pd.NA``, so only use it for reads that never hand the frame to user code.
+        """
+        table, version = self.table(workspace, version)
+        if table is None:
+            return None, None
+
+        key = (workspace, version, arrow_dtypes)
+        if self.frame_cache_size:
+            with self._cache_lock:
+                if key in self._frames:
+                    self._frames.move_to_end(key)
+                    return self._frames[key], version
+
+        if arrow_dtypes:
+            df = table.to_pandas(types_mapper=pd.ArrowDtype, split_blocks=True)
+        else:
+            df = table.to_pandas()
+
+        if self.frame_cache_size:
+            with self._cache_lock:
+                self._frames[key] = df
+                while len(self._frames) > self.frame_cache_size:
+                    self._frames.popitem(last=False)
+        return df, version
+
+    # ---- writes ----------------------------------------------------------
+
+    def _to_arrow(self, df: pd.DataFrame) -> Tuple[pa.Table, list]:
+        """Convert ``df`` for storage; returns the table and the columns that had to be stored as text."""
+        duplicates = sorted({str(col) for col in df.columns[df.columns.duplicated()]})
+        if duplicates:
+            raise UnsupportedDataFrame(f"Duplicate column names: {', '.join(duplicates)}")
+
+        try:
+            return pa.Table.from_pandas(df), []
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            pass
+
+        # mixed-type object columns (e.g. numbers and 'N/A') have no Arrow type;
+        # store only those as text and leave every other column untouched
+        df = df.copy(deep=False)
+        stringified = []
+        for col in df.columns:
+            if df[col].dtype != object:
+                continue
+            try:
+                pa.array(df[col], from_pandas=True)
+            except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+                df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+                stringified.append(str(col))
+        return pa.Table.from_pandas(df), stringified
+
+    def _write_version(self, workspace: str, version: int, table: pa.Table):
+        directory = self._workspace_dir(workspace)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.v', suffix='.arrow')
+        os.close(fd)
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, self._version_path(workspace, version))
+
+    def reset(self, workspace: str, df: pd.DataFrame) -> Dict[str, Any]:
+        """Start a fresh history with ``df`` as the only version (e.g. on upload).
+
+        The returned state carries ``stringified_columns`` (not persisted) listing
+        mixed-type columns that were stored as text.
+        """
+        table, stringified = self._to_arrow(df)
+        with self._locked(workspace):
+            state = self.state(workspace)
+            version = state['next_version']
+            self._write_version(workspace, version, table)
+            state = {'version': version, 'next_version': version + 1, 'undo': [], 'redo': [],
+                     'retired': state.get('retired', {})}
+            self._collect_garbage(workspace, state)
+            self._write_state(workspace, state)
+        return dict(state, stringified_columns=stringified)
+
+    def commit(self, workspace: str, df: pd.DataFrame, expected_version: Optional[int]) -> Dict[str, Any]:
+        """Publish ``df`` as the next version if the workspace is still at ``expected_version``."""
+        table, stringified = self._to_arrow(df)
+        with self._locked(workspace):
+            state = self.state(workspace)
+            if state['version'] != expected_version:
+                raise VersionConflict(workspace, expected_version, state['version'])
+            version = state['next_version']
+            self._write_version(workspace, version, table)
+            if state['version'] is not None:
+                state['undo'] = (state['undo'] + [state['version']])[-self.max_history:]
+            state.update({'version': version, 'next_version': version + 1, 'redo': []})
+            self._collect_garbage(workspace, state)
+            self._write_state(workspace, state)
+        return dict(state, stringified_columns=stringified)
+
+    def undo(self, workspace: str) -> Optional[Dict[str, Any]]:
+        with self._locked(workspace):
+            state = self.state(workspace)
+            if not state['undo']:
+                return None
+            if state['version'] is not None:
+                state['redo'].append(state['version'])
+            state['version'] = state['undo'].pop()
+            self._write_state(workspace, state)
+        return state
+
+    def redo(self, workspace: str) -> Optional[Dict[str, Any]]:
+        with self._locked(workspace):
+            state = self.state(workspace)
+            if not state['redo']:
+                return None
+            if state['version'] is not None:
+                state['undo'] = (state['undo'] + [state['version']])[-self.max_history:]
+            state['version'] = state['redo'].pop()
+            self._write_state(workspace, state)
+        return state
+
+    # ---- conversation ----------------------------------------------------
+
+    def messages(self, workspace: str) -> List[Dict[str, Any]]:
+        path = os.path.join(self._workspace_dir(workspace), 'conversation.json')
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+
+    def append_messages(self, workspace: str, new_messages: List[Dict[str, Any]]):
+        with self._locked(workspace):
+            messages = (self.messages(workspace) + new_messages)[-self.MAX_MESSAGES:]
+            self._write_json(workspace, 'conversation.json', messages)
+
+    def clear_messages(self, workspace: str):
+        with self._locked(workspace):
+            self._write_json(workspace, 'conversation.json', [])
+
+    def export_csv(self, workspace: str, df: pd.DataFrame) -> str:
+        """Write ``df`` to ``<workspace>/data.csv`` (replaced atomically) and return the path."""
+        directory = self._workspace_dir(workspace)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.csv')
+        os.close(fd)
+        df.to_csv(tmp_path, index=False)
+        path = os.path.join(directory, 'data.csv')
+        os.replace(tmp_path, path)
+        return path
+
+    def _collect_garbage(self, workspace: str, state: Dict[str, Any]):
+        """Delete versions that left the history more than ``gc_grace`` seconds ago.
+
+        Callers hold the workspace lock and write ``state`` afterwards, which records in
+        ``retired`` when each unreferenced version was first seen.
+        """
+        live = set(state['undo']) | set(state['redo']) | {state['version']}
+        retired = state.setdefault('retired', {})
+        now = time.time()
+        directory = self._workspace_dir(workspace)
+        for name in os.listdir(directory):
+            match = re.match(r'^v(\d+)\.arrow$', name)
+            if not match:
+                continue
+            version = int(match.group(1))
+            if version in live:
+                retired.pop(str(version), None)
+                continue
+            if now - retired.setdefault(str(version), now) < self.gc_grace:
+                continue
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                # still mapped by a reader on Windows; retried on the next commit
+                continue
+            retired.pop(str(version), None)
@@ -0,0 +1,357 @@
+import json
+import os
+import queue
+import random
+import threading
+import time
+import http.client
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Any, Optional
+from urllib.parse import urlsplit, quote
+
+DEFAULT_BASE_URL = "https://generativelanguage.googleapis.com"
+
+
+class ModelClientError(Exception):
+    def __init__(self, message: str, retryable: bool = False, status: Optional[int] = None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.status = status
+
+
+class DeadlineExceeded(ModelClientError):
+    def __init__(self, message: str = "Model call deadline exceeded"):
+        super().__init__(message, retryable=False)
+
+
+class ModelStats:
+    """Rolling latency and error counters for a single model."""
+
+    def __init__(self, window: int = 500):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.attempts = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.timeouts = 0
+        self.errors: Dict[str, int] = {}
+
+    def record_attempt(self, retry: bool = False):
+        with self._lock:
+            self.attempts += 1
+            if retry:
+                self.retries += 1
+
+    def record_hedge(self, won: bool = False):
+        with self._lock:
+            if won:
+                self.hedge_wins += 1
+            else:
+                self.hedges += 1
+
+    def record_error(self, kind: str):
+        with self._lock:
+            self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def record_call(self, latency: float, ok: bool, timed_out: bool = False):
+        with self._lock:
+            self.calls += 1
+            if ok:
+                self.successes += 1
+                self._latencies.append(latency)
+            else:
+                self.failures += 1
+            if timed_out:
+                self.timeouts += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            snapshot = {
+                'calls': self.calls,
+                'successes': self.successes,
+                'failures': self.failures,
+                'attempts': self.attempts,
+                'retries': self.retries,
+                'hedges': self.hedges,
+                'hedge_wins': self.hedge_wins,
+                'timeouts': self.timeouts,
+                'errors': dict(self.errors),
+            }
+        for name, q in (('p50', 0.50), ('p95', 0.95), ('p99', 0.99)):
+            if latencies:
+                idx = min(len(latencies) - 1, int(round(q * (len(latencies) - 1))))
+                snapshot[f'{name}_ms'] = round(latencies[idx] * 1000, 1)
+            else:
+                snapshot[f'{name}_ms'] = None
+        return snapshot
+
+
+_stats_lock = threading.Lock()
+_model_stats: Dict[str, ModelStats] = {}
+
+
+def _reset_locks_after_fork():
+    global _stats_lock
+    _stats_lock = threading.Lock()
+    for stats in _model_stats.values():
+        stats._lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_locks_after_fork)
+
+
+def get_stats(model_name: str) -> ModelStats:
+    with _stats_lock:
+        if model_name not in _model_stats:
+            _model_stats[model_name] = ModelStats()
+        return _model_stats[model_name]
+
+
+def get_all_stats() -> Dict[str, Dict[str, Any]]:
+    with _stats_lock:
+        items = list(_model_stats.items())
+    return {name: stats.snapshot() for name, stats in items}
+
+
+class ConnectionPool:
+    """Keeps persistent HTTP(S) connections to a single host for reuse across calls."""
+
+    def __init__(self, base_url: str, max_size: int = 8):
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme or 'https'
+        self.host = parts.hostname
+        self.port = parts.port
+        self.path_prefix = parts.path.rstrip('/')
+        self._idle = queue.LifoQueue(maxsize=max_size)
+
+    def _new_connection(self, timeout: float) -> http.client.HTTPConnection:
+        if self.scheme == 'https':
+            return http.client.HTTPSConnection(self.host, self.port, timeout=timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+
+    def acquire(self, timeout: float, fresh: bool = False) -> http.client.HTTPConnection:
+        if fresh:
+            return self._new_connection(timeout)
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            return self._new_connection(timeout)
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn
+
+    def release(self, conn: http.client.HTTPConnection):
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def discard(self, conn: http.client.HTTPConnection):
+        conn.close()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class ModelClient:
+    """Gemini generateContent client with deadlines, jittered retries and hedged requests.
+
+    Point ``base_url`` (or ``GEMINI_BASE_URL``) at a local stub server to exercise
+    delays and failures without calling the real API.
+    """
+
+    RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+    def __init__(self, model_name: str, api_key: str, base_url: Optional[str] = None,
+                 deadline: float = 60.0, attempt_timeout: float = 30.0, max_retries: int = 2,
+                 backoff_base: float = 0.25, backoff_cap: float = 4.0,
+                 hedge_after: Optional[float] = None, pool_size: int = 8):
+        self.model_name = model_name
+        self.api_key = api_key
+        self.base_url = base_url or os.environ.get('GEMINI_BASE_URL', DEFAULT_BASE_URL)
+        self.deadline = deadline
+        self.attempt_timeout = attempt_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.hedge_after = hedge_after
+        self.stats = get_stats(model_name)
+        self._pool = ConnectionPool(self.base_url, max_size=pool_size)
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix=f"model-{model_name}")
+
+    def generate(self, prompt: str, temperature: float = 0.3, max_output_tokens: int = 1000,
+                 deadline: Optional[float] = None) -> Dict[str, Any]:
+        """Return the parsed generateContent JSON, or raise ModelClientError."""
+        payload = json.dumps({
+            'contents': [{'role': 'user', 'parts': [{'text': prompt}]}],
+            'generationConfig': {
+                'temperature': temperature,
+                'maxOutputTokens': max_output_tokens,
+            },
+        }).encode('utf-8')
+
+        start = time.monotonic()
+        stop_at = start + (deadline if deadline is not None else self.deadline)
+        last_error: Optional[ModelClientError] = None
+        out_of_time = False
+
+        for attempt in range(self.max_retries + 1):
+            if attempt > 0:
+                sleep_for = random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+                if time.monotonic() + sleep_for >= stop_at:
+                    out_of_time = True
+                    break
+                time.sleep(sleep_for)
+            try:
+                result = self._hedged_attempt(payload, stop_at, retry=attempt > 0)
+                self.stats.record_call(time.monotonic() - start, ok=True)
+                return result
+            except DeadlineExceeded as e:
+                last_error = e
+                out_of_time = True
+                break
+            except ModelClientError as e:
+                last_error = e
+                if not e.retryable:
+                    break
+
+        elapsed = time.monotonic() - start
+        self.stats.record_call(elapsed, ok=False, timed_out=out_of_time)
+        if out_of_time and not isinstance(last_error, DeadlineExceeded):
+            raise DeadlineExceeded(f"Model call deadline exceeded after {elapsed:.2f}s (last error: {last_error})")
+        if isinstance(last_error, DeadlineExceeded):
+            raise DeadlineExceeded(f"Model call deadline exceeded after {elapsed:.2f}s")
+        raise last_error
+
+    def _hedged_attempt(self, payload: bytes, stop_at: float, retry: bool) -> Dict[str, Any]:
+        remaining = stop_at - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded()
+
+        primary = self._executor.submit(self._post, payload, stop_at, retry)
+        pending = {primary}
+        hedge = None
+
+        if self.hedge_after is not None and self.hedge_after < remaining:
+            done, _ = wait(pending, timeout=self.hedge_after)
+            if not done:
+                hedge = self._executor.submit(self._post, payload, stop_at, retry)
+                self.stats.record_hedge()
+                pending.add(hedge)
+
+        last_error: Optional[ModelClientError] = None
+        while pending:
+            remaining = stop_at - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except ModelClientError as e:
+                    last_error = e
+                    continue
+                if future is hedge:
+                    self.stats.record_hedge(won=True)
+                for other in pending:
+                    other.cancel()
+                return result
+
+        if pending:
+            for future in pending:
+                future.cancel()
+            raise DeadlineExceeded()
+        raise last_error
+
+    def _post(self, payload: bytes, stop_at: float, retry: bool) -> Dict[str, Any]:
+        self.stats.record_attempt(retry=retry)
+        timeout = min(self.attempt_timeout, stop_at - time.monotonic())
+        if timeout <= 0:
+            raise DeadlineExceeded()
+
+        path = f"{self._pool.path_prefix}/v1beta/models/{quote(self.model_name)}:generateContent"
+        headers = {
+            'Content-Type': 'application/json',
+            'x-goog-api-key': self.api_key,
+            'Connection': 'keep-alive',
+        }
+
+        conn = self._pool.acquire(timeout)
+        try:
+            try:
+                reused = conn.sock is not None
+                conn.request('POST', path, body=payload, headers=headers)
+                response = conn.getresponse()
+                body = response.read()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                if not reused:
+                    raise
+                # the server closed this idle pooled connection; reconnect once without spending a retry
+                self._pool.discard(conn)
+                self.stats.record_error('stale_connection')
+                conn = self._pool.acquire(timeout, fresh=True)
+                conn.request('POST', path, body=payload, headers=headers)
+                response = conn.getresponse()
+                body = response.read()
+        except TimeoutError as e:
+            self._pool.discard(conn)
+            self.stats.record_error('timeout')
+            raise ModelClientError(f"Model request timed out after {timeout:.2f}s", retryable=True) from e
+        except (OSError, http.client.HTTPException) as e:
+            self._pool.discard(conn)
+            self.stats.record_error('connection')
+            raise ModelClientError(f"Connection error: {e}", retryable=True) from e
+
+        if response.will_close:
+            self._pool.discard(conn)
+        else:
+            self._pool.release(conn)
+
+        if response.status != 200:
+            self.stats.record_error(f"http_{response.status}")
+            raise ModelClientError(
+                f"Model returned HTTP {response.status}: {body[:200].decode('utf-8', 'replace')}",
+                retryable=response.status in self.RETRYABLE_STATUSES,
+                status=response.status,
+            )
+
+        try:
+            return json.loads(body)
+        except ValueError as e:
+            self.stats.record_error('bad_response')
+            raise ModelClientError(f"Invalid JSON from model: {e}", retryable=True) from e
+
+    def preconnect(self, timeout: float = 5.0):
+        """Open (TCP + TLS) one pooled connection so the first call skips the handshake."""
+        conn = self._pool.acquire(timeout)
+        try:
+            conn.connect()
+        except OSError as e:
+            self._pool.discard(conn)
+            print(f"Model preconnect failed: {e}")
+            return
+        self._pool.release(conn)
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._pool.close()
+
+
+def extract_text(response: Dict[str, Any]) -> Optional[str]:
+    for candidate in response.get('candidates') or []:
+        for part in (candidate.get('content') or {}).get('parts') or []:
+            if part.get('text'):
+                return part['text']
+    return None
@@ -0,0 +1,98 @@
+"""Local stand-in for the Gemini generateContent endpoint.
+
+Injects configurable delays and failures so ModelClient timeouts, retries and
+hedging can be exercised without the real API:
+
+    python stub_model_server.py --port 8765 --delay 0.2 --slow-rate 0.1 --slow-delay 5 --fail-rate 0.1
+    GEMINI_BASE_URL=http://127.0.0.1:8765 python app.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubConfig:
+    def __init__(self, delay: float = 0.0, slow_rate: float = 0.0, slow_delay: float = 5.0,
+                 fail_rate: float = 0.0, fail_status: int = 503, reply: str = "Stub reply.",
+                 slow_first: int = 0):
+        self.delay = delay
+        self.slow_rate = slow_rate
+        self.slow_delay = slow_delay
+        self.fail_rate = fail_rate
+        self.fail_status = fail_status
+        self.reply = reply
+        # the first N requests always take slow_delay (deterministic hedging tests)
+        self.slow_first = slow_first
+        self.requests = 0
+        self.lock = threading.Lock()
+
+
+def make_handler(config: StubConfig):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # headers and body go out in separate writes; without TCP_NODELAY every
+        # keep-alive response stalls ~40ms on Nagle + delayed ACK
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            self.rfile.read(length)
+            with config.lock:
+                config.requests += 1
+                number = config.requests
+
+            if number <= config.slow_first or (config.slow_rate and random.random() < config.slow_rate):
+                time.sleep(config.slow_delay)
+            elif config.delay:
+                time.sleep(config.delay)
+
+            if config.fail_rate and random.random() < config.fail_rate:
+                self._send(config.fail_status, {'error': {'code': config.fail_status, 'message': 'injected failure'}})
+                return
+
+            self._send(200, {
+                'candidates': [{'content': {'role': 'model', 'parts': [{'text': config.reply}]}}],
+            })
+
+        def _send(self, status: int, payload: dict):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+
+def start_stub_server(config: StubConfig, host: str = '127.0.0.1', port: int = 0) -> ThreadingHTTPServer:
+    """Start the stub in a daemon thread; port 0 picks a free port (see server.server_address)."""
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub Gemini server with injected delays and failures")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--delay', type=float, default=0.0, help="base response delay in seconds")
+    parser.add_argument('--slow-rate', type=float, default=0.0, help="fraction of requests that are slow")
+    parser.add_argument('--slow-delay', type=float, default=5.0, help="delay for slow requests in seconds")
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument('--fail-status', type=int, default=503)
+    parser.add_argument('--slow-first', type=int, default=0, help="number of initial requests that are slow")
+    args = parser.parse_args()
+
+    config = StubConfig(args.delay, args.slow_rate, args.slow_delay, args.fail_rate, args.fail_status,
+                        slow_first=args.slow_first)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(config))
+    print(f"Stub model server listening on http://{args.host}:{args.port}")
+    server.serve_forever()
@@ -0,0 +1,101 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+POLL_READY = """
+def poll_ready(client):
+    codes = []
+    for _ in range(2000):
+        codes.append(client.get('/ready').status_code)
+        if codes[-1] == 200:
+            break
+        time.sleep(0.005)
+    return codes
+"""
+
+
+def run_fresh(code, tmp_path, **env):
+    """Run ``code`` in a new interpreter (so nothing is imported yet) and return the JSON it prints last."""
+    env = dict(os.environ, GEMINI_API_KEY='test-key', GEMINI_PRECONNECT='0',
+               DATASET_STORE_DIR=str(tmp_path), **env)
+    script = "import json, os, sys, time\n" + POLL_READY + textwrap.dedent(code)
+    result = subprocess.run([sys.executable, '-c', script], cwd=HERE, env=env,
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_import_leaves_heavy_modules_unloaded(tmp_path):
+    loaded = run_fresh("""
+        import app
+        print(json.dumps([m for m in ('pandas', 'numpy', 'pyarrow', 'openpyxl') if m in sys.modules]))
+    """, tmp_path)
+
+    assert loaded == []
+
+
+def test_ready_is_503_until_warm_up_finishes(tmp_path):
+    result = run_fresh("""
+        import app
+        codes = poll_ready(app.app.test_client())
+        print(json.dumps({'codes': codes, 'pandas': 'pandas' in sys.modules,
+                          'steps': sorted(app.warm_up_status['steps'])}))
+    """, tmp_path)
+
+    assert result['codes'][0] == 503
+    assert result['codes'][-1] == 200
+    assert result['pandas']
+    assert result['steps'] == ['chat_agent', 'dataset_store', 'imports']
+
+
+def test_app_warmup_0_is_ready_without_warming_up(tmp_path):
+    result = run_fresh("""
+        import app
+        codes = poll_ready(app.app.test_client())
+        print(json.dumps({'codes': codes, 'pandas': 'pandas' in sys.modules,
+                          'started_at': app.warm_up_status['started_at']}))
+    """, tmp_path, APP_WARMUP='0')
+
+    assert result['codes'] == [200]
+    assert not result['pandas']
+    assert result['started_at'] is None
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="needs os.fork")
+def test_warm_up_runs_once_per_process_and_again_after_fork(tmp_path):
+    result = run_fresh("""
+        import app
+        client = app.app.test_client()
+        poll_ready(client)
+        started_at = app.warm_up_status['started_at']
+        poll_ready(client)
+        app.start_warm_up()
+        parent = {'started_again': app.warm_up_status['started_at'] != started_at}
+
+        read_end, write_end = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            child = {'warm_up_pid_reset': app._warm_up_pid is None}
+            child['codes'] = poll_ready(app.app.test_client())
+            child['warmed_in_child'] = app._warm_up_pid == os.getpid()
+            child['started_again'] = app.warm_up_status['started_at'] != started_at
+            os.write(write_end, json.dumps(child).encode())
+            os._exit(0)
+        os.close(write_end)
+        os.waitpid(pid, 0)
+        with os.fdopen(read_end) as f:
+            child = json.loads(f.read())
+        print(json.dumps({'parent': parent, 'child': child}))
+    """, tmp_path)
+
+    assert not result['parent']['started_again']
+    child = result['child']
+    assert child['warm_up_pid_reset']
+    assert child['codes'][0] == 503 and child['codes'][-1] == 200
+    assert child['warmed_in_child'] and child['started_again']
@@ -0,0 +1,172 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from code_executor import CodeExecutor
+from code_vectorizer import analyze_code, compare_on_sample
+
+
+@pytest.fixture
+def df():
+    rng = np.random.default_rng(0)
+    n = 300
+    return pd.DataFrame({
+        'Total_Score': rng.uniform(0, 100, n),
+        'A': rng.integers(0, 10, n),
+        'B': rng.integers(0, 10, n),
+        'Name': rng.choice(['ann', 'bob', 'cy'], n),
+    })
+
+
+def test_apply_axis1_lambda_becomes_column_expression():
+    report = analyze_code("df['Avg'] = df.apply(lambda r: (r['A'] + r.B) / 2, axis=1)")
+
+    assert [f.kind for f in report.findings] == ['apply_axis1']
+    assert report.findings[0].rewritten
+    assert report.rewritten_code == "df['Avg'] = (df['A'] + df['B']) / 2"
+
+
+def test_apply_axis1_conditional_uses_np_where():
+    report = analyze_code(
+        "df['Grade'] = df.apply(lambda row: 'Pass' if row['Total_Score'] >= 50 and row['A'] > 2 else 'Fail', axis=1)")
+
+    assert "np.where((df['Total_Score'] >= 50) & (df['A'] > 2), 'Pass', 'Fail')" in report.rewritten_code
+    assert 'apply' not in report.rewritten_code
+
+
+def test_iterrows_at_assignment_becomes_column_assignment():
+    code = "for i, row in df.iterrows():\n    df.at[i, 'Flag'] = row['Total_Score'] < 60"
+    report = analyze_code(code)
+
+    assert [f.kind for f in report.findings] == ['iterrows']
+    assert report.rewritten_code == "df['Flag'] = df['Total_Score'] < 60"
+
+
+def test_iterrows_filtered_append_becomes_masked_extend():
+    code = ("names = []\n"
+            "for i, row in df.iterrows():\n"
+            "    if row['Total_Score'] > 80:\n"
+            "        names.append(row['Name'].upper())")
+    report = analyze_code(code)
+
+    assert report.findings[0].rewritten
+    assert "names.extend(" in report.rewritten_code
+    assert "df['Name'].str.upper()" in report.rewritten_code
+    assert "[df['Total_Score'] > 80]" in report.rewritten_code
+
+
+@pytest.mark.parametrize('code, kind', [
+    # named function instead of a lambda
+    ("df['x'] = df.apply(my_func, axis=1)", 'apply_axis1'),
+    # row.name is the index label, not a column
+    ("df['y'] = df.apply(lambda r: 1 if r.name > 3 else 0, axis=1)", 'apply_axis1'),
+    # receiver isn't a plain name
+    ("df['y'] = df[['A', 'B']].apply(lambda r: r['A'] + r['B'], axis=1)", 'apply_axis1'),
+    # loop index used in the appended value / the condition
+    ("out = []\nfor i, row in df.iterrows():\n    out.append(row['B'] + i)", 'iterrows'),
+    ("out = []\nfor i, row in df.iterrows():\n    if i > 3:\n        out.append(row['B'])", 'iterrows'),
+    # more than one statement in the loop body
+    ("out = []\nfor i, row in df.iterrows():\n    x = row['A']\n    out.append(x)", 'iterrows'),
+    # itertuples positional access
+    ("out = []\nfor r in df.itertuples():\n    out.append(r[1])", 'itertuples'),
+    # range(len()) loops are only reported
+    ("out = []\nfor i in range(len(df)):\n    out.append(df['A'][i])", 'loop_append'),
+    ("out = []\nfor v in df['A']:\n    out.append(v * 2)", 'loop_append'),
+    ("out = []\nfor i in df.index:\n    out.append(df.loc[i, 'A'])", 'loop_append'),
+    ("out = []\nfor i in range(df.shape[0]):\n    out.append(df['A'].iloc[i])", 'loop_append'),
+    ("out = []\nfor n, s in zip(df['Name'], df['Total_Score']):\n    if s > 70:\n        out.append(n)", 'loop_append'),
+    # comprehensions over a column, the index or range(len())
+    ("out = [df.loc[i, 'A'] * 2 for i in range(len(df))]", 'comprehension'),
+    ("n = sum(1 for s in df['Total_Score'] if s > 70)", 'comprehension'),
+    ("out = {i: df.at[i, 'A'] for i in df.index}", 'comprehension'),
+    ("acc = pd.DataFrame()\nfor g in groups:\n    acc = pd.concat([acc, g])", 'concat_in_loop'),
+])
+def test_unsafe_shapes_are_reported_but_not_rewritten(code, kind):
+    report = analyze_code(code)
+
+    assert [f.kind for f in report.findings] == [kind]
+    assert not report.findings[0].rewritten
+    assert report.rewritten_code is None
+    assert report.remaining
+
+
+def test_vectorized_code_has_no_findings():
+    report = analyze_code("df['Avg'] = (df['A'] + df['B']) / 2\ncols = [c.upper() for c in df.columns]")
+
+    assert not report.has_findings
+    assert report.estimated_speedup == 1.0
+
+
+def test_syntax_error_is_not_analyzed():
+    assert not analyze_code("df['x'] = (").has_findings
+
+
+def test_compare_on_sample_accepts_equivalent_rewrite(df):
+    code = "df['Grade'] = df.apply(lambda row: 'Pass' if row['Total_Score'] >= 50 else 'Fail', axis=1)"
+    report = analyze_code(code)
+
+    check = compare_on_sample(CodeExecutor(), code, report.rewritten_code, df, is_query=False, sample_rows=100)
+
+    assert check['equivalent']
+    assert check['sample_rows'] == 100
+    assert check['original_time'] > 0 and check['candidate_time'] > 0
+
+
+def test_compare_on_sample_rejects_divergent_rewrite(df):
+    original = "df['Avg'] = df.apply(lambda r: (r['A'] + r['B']) / 2, axis=1)"
+    divergent = "df['Avg'] = (df['A'] + df['B']) // 2"
+
+    check = compare_on_sample(CodeExecutor(), original, divergent, df, is_query=False)
+
+    assert not check['equivalent']
+    assert check['reason'] == 'results differ on sample'
+
+
+def test_round_rewrite_keeps_integer_result(df):
+    code = "df['R'] = df.apply(lambda r: round(r['Total_Score']), axis=1)"
+    report = analyze_code(code)
+
+    assert report.rewritten_code == "df['R'] = df['Total_Score'].round().astype(int)"
+    assert compare_on_sample(CodeExecutor(), code, report.rewritten_code, df, is_query=False)['equivalent']
+
+
+def test_compare_on_sample_rejects_dtype_change(df):
+    # apply(axis=1) upcasts each row to float when the frame has only int and float columns
+    original = "df['H'] = df.apply(lambda r: r['A'] // 2, axis=1)"
+    report = analyze_code(original)
+
+    check = compare_on_sample(CodeExecutor(), original, report.rewritten_code, df[['Total_Score', 'A']],
+                              is_query=False)
+
+    assert not check['equivalent']
+
+
+def test_compare_on_sample_sees_null_rows(df):
+    df = df.copy()
+    df.loc[150, 'Total_Score'] = np.nan
+    # round(nan) raises in the original, so a rewrite that quietly fills it must be rejected
+    code = "df['R'] = df.apply(lambda r: round(r['Total_Score']), axis=1)"
+    loose = "df['R'] = df['Total_Score'].fillna(0).round().astype(int)"
+
+    check = compare_on_sample(CodeExecutor(), code, loose, df, is_query=False, sample_rows=100)
+
+    assert not check['equivalent']
+
+
+def test_compare_on_sample_sees_tail_rows(df):
+    original = "df['R'] = df['A']"
+    differs_at_end = "df['R'] = df['A']\ndf.loc[df.index >= 290, 'R'] = -1"
+
+    check = compare_on_sample(CodeExecutor(), original, differs_at_end, df, is_query=False, sample_rows=100)
+
+    assert not check['equivalent']
+    assert check['sample_rows'] == 100
+
+
+def test_compare_on_sample_rejects_failing_rewrite_for_queries(df):
+    original = "print(df['A'].sum())"
+    broken = "print(df['Missing'].sum())"
+
+    check = compare_on_sample(CodeExecutor(), original, broken, df, is_query=True)
+
+    assert not check['equivalent']
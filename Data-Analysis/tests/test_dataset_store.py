@@ -0,0 +1,146 @@
+import pandas as pd
+import pytest
+
+from dataset_store import DatasetStore, UnsupportedDataFrame, VersionConflict
+
+
+@pytest.fixture
+def store(tmp_path):
+    return DatasetStore(root=str(tmp_path))
+
+
+def test_commit_undo_redo_move_version_pointer(store):
+    first = store.reset('ws', pd.DataFrame({'a': [1, 2, 3]}))
+    second = store.commit('ws', pd.DataFrame({'a': [1, 2, 3], 'b': [4, 5, 6]}), first['version'])
+
+    assert second['undo'] == [first['version']]
+    assert list(store.dataframe('ws')[0].columns) == ['a', 'b']
+
+    assert store.undo('ws')['version'] == first['version']
+    assert list(store.dataframe('ws')[0].columns) == ['a']
+    assert store.redo('ws')['version'] == second['version']
+    assert store.undo('ws') is not None
+    assert store.undo('ws') is None
+
+
+def test_commit_against_stale_version_conflicts(store):
+    state = store.reset('ws', pd.DataFrame({'a': [1]}))
+    store.commit('ws', pd.DataFrame({'a': [2]}), state['version'])
+
+    with pytest.raises(VersionConflict):
+        store.commit('ws', pd.DataFrame({'a': [3]}), state['version'])
+
+
+def test_dataframe_is_numpy_backed_and_not_cached_by_default(store):
+    store.reset('ws', pd.DataFrame({'a': [1.5, None], 's': ['x', None]}))
+
+    df, _ = store.dataframe('ws')
+
+    assert df['a'].dtype == 'float64'
+    assert pd.isna(df.loc[1, 'a']) and df.loc[1, 'a'] is not pd.NA
+    assert store.dataframe('ws')[0] is not df
+
+
+def test_arrow_dtypes_only_on_request(store):
+    store.reset('ws', pd.DataFrame({'a': [1.5, None], 's': ['x', None]}))
+
+    df, _ = store.dataframe('ws', arrow_dtypes=True)
+
+    assert all(isinstance(dtype, pd.ArrowDtype) for dtype in df.dtypes)
+
+
+def test_only_mixed_type_columns_are_stored_as_text(store):
+    df = pd.DataFrame({
+        'score': pd.Series([1, 'N/A', 2.5], dtype=object),
+        'name': ['a', 'b', 'c'],
+        'value': [1.0, 2.0, 3.0],
+    })
+
+    state = store.reset('ws', df)
+    stored, _ = store.dataframe('ws')
+
+    assert state['stringified_columns'] == ['score']
+    assert stored['score'].tolist() == ['1', 'N/A', '2.5']
+    assert (stored['value'] > 1.5).tolist() == [False, True, True]
+
+
+def test_dropped_versions_outlive_the_grace_period(store):
+    stale = store.reset('ws', pd.DataFrame({'a': [1]}))['version']
+    store.reset('ws', pd.DataFrame({'a': [2]}))
+
+    # a reader that read state.json before the second upload can still map its version
+    assert store.table('ws', stale)[0].column('a').to_pylist() == [1]
+
+    store.gc_grace = 0
+    store.reset('ws', pd.DataFrame({'a': [3]}))
+    with pytest.raises(FileNotFoundError):
+        DatasetStore(root=store.root).table('ws', stale)
+
+
+def test_reader_retries_after_its_version_is_collected(store, monkeypatch):
+    store.gc_grace = 0
+    stale = store.reset('ws', pd.DataFrame({'a': [1]}))
+    store.reset('ws', pd.DataFrame({'a': [2]}))
+    current = store.state
+    reads = []
+
+    def state_read_before_upload(workspace):
+        reads.append(workspace)
+        return stale if len(reads) == 1 else current(workspace)
+
+    monkeypatch.setattr(store, 'state', state_read_before_upload)
+    table, version = store.table('ws')
+
+    assert version == stale['version'] + 1
+    assert table.column('a').to_pylist() == [2]
+
+
+def test_duplicate_columns_are_rejected_clearly(store):
+    state = store.reset('ws', pd.DataFrame({'a': [1]}))
+    duplicated = pd.DataFrame([[1, 2]], columns=['a', 'a'])
+
+    with pytest.raises(UnsupportedDataFrame, match='Duplicate column names: a'):
+        store.commit('ws', duplicated, state['version'])
+    assert store.state('ws')['version'] == state['version']
+
+
+def test_conversation_is_per_workspace(store):
+    store.append_messages('one', [{'role': 'user', 'content': 'hi'}])
+
+    assert len(store.messages('one')) == 1
+    assert store.messages('two') == []
+    store.clear_messages('one')
+    assert store.messages('one') == []
+
+
+def test_invalid_workspace_name(store):
+    with pytest.raises(ValueError):
+        store.state('../etc')
+
+
+def test_chat_code_sees_nan_not_pd_na(tmp_path, monkeypatch):
+    import app
+    from chat_agent import ChatAgent
+    from stub_model_server import StubConfig, start_stub_server
+
+    reply = ("Adding grades.\n<execute_code>\n"
+             "df['Grade'] = np.where(df['Score'] >= 70, 'Pass', 'Fail')\n"
+             "df['Above'] = [s > 70 for s in df['Score']]\n</execute_code>")
+    server = start_stub_server(StubConfig(reply=reply))
+    monkeypatch.setenv('GEMINI_BASE_URL', f"http://127.0.0.1:{server.server_address[1]}")
+    monkeypatch.setenv('GEMINI_API_KEY', 'stub-key')
+    monkeypatch.setenv('APP_WARMUP', '0')
+    monkeypatch.setattr(app, '_dataset_store', DatasetStore(root=str(tmp_path)))
+    monkeypatch.setattr(app, '_chat_agent', ChatAgent())
+    app._dataset_store.reset('default', pd.DataFrame({'Name': ['a', 'b', 'c'], 'Score': [83.5, None, 64.0]}))
+
+    try:
+        response = app.app.test_client().post('/chat', json={'message': 'Add a grade column'}).get_json()
+    finally:
+        app._chat_agent.gemini_model.close()
+        server.shutdown()
+
+    assert response['success'] and response['dataframe_updated'], response
+    stored, _ = app._dataset_store.dataframe('default')
+    assert stored['Grade'].tolist() == ['Pass', 'Fail', 'Fail']
+    assert stored['Above'].tolist() == [True, False, False]
@@ -0,0 +1,118 @@
+import itertools
+
+import pytest
+
+from model_client import ModelClient, ModelClientError, DeadlineExceeded, extract_text
+from stub_model_server import StubConfig, start_stub_server
+
+_names = itertools.count()
+
+
+@pytest.fixture
+def stub():
+    config = StubConfig()
+    server = start_stub_server(config)
+    config.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield config
+    server.shutdown()
+    server.server_close()
+
+
+def make_client(stub, **kwargs):
+    # stats are registered per model name, so give each client its own
+    kwargs.setdefault('backoff_base', 0.01)
+    return ModelClient(f"test-model-{next(_names)}", 'test-key', base_url=stub.url, **kwargs)
+
+
+def test_generate_returns_stub_reply(stub):
+    client = make_client(stub)
+    assert extract_text(client.generate('hello')) == 'Stub reply.'
+    assert extract_text(client.generate('again')) == 'Stub reply.'
+
+    stats = client.stats.snapshot()
+    assert stats['calls'] == 2
+    assert stats['successes'] == 2
+    assert stats['attempts'] == 2
+    assert stats['retries'] == 0
+    assert stats['p50_ms'] is not None
+
+
+def test_retries_on_503_then_gives_up(stub):
+    stub.fail_rate = 1.0
+    client = make_client(stub, max_retries=2)
+
+    with pytest.raises(ModelClientError) as excinfo:
+        client.generate('hello')
+
+    assert excinfo.value.status == 503
+    assert stub.requests == 3
+    stats = client.stats.snapshot()
+    assert stats['failures'] == 1
+    assert stats['attempts'] == 3
+    assert stats['retries'] == 2
+    assert stats['errors'] == {'http_503': 3}
+
+
+def test_non_retryable_status_fails_fast(stub):
+    stub.fail_rate = 1.0
+    stub.fail_status = 400
+    client = make_client(stub, max_retries=2)
+
+    with pytest.raises(ModelClientError) as excinfo:
+        client.generate('hello')
+
+    assert excinfo.value.status == 400
+    assert not excinfo.value.retryable
+    assert stub.requests == 1
+
+
+def test_deadline_exceeded_on_slow_response(stub):
+    stub.delay = 1.0
+    client = make_client(stub, deadline=0.3, attempt_timeout=0.2)
+
+    with pytest.raises(DeadlineExceeded):
+        client.generate('hello')
+
+    stats = client.stats.snapshot()
+    assert stats['failures'] == 1
+    assert stats['timeouts'] == 1
+    assert stats['errors'].get('timeout', 0) >= 1
+
+
+def test_hedged_request_wins_over_slow_primary(stub):
+    # only the first request is slow; the hedge fired after 50ms answers first
+    stub.slow_first = 1
+    stub.slow_delay = 1.0
+    client = make_client(stub, hedge_after=0.05, deadline=0.8)
+
+    assert extract_text(client.generate('hello')) == 'Stub reply.'
+
+    stats = client.stats.snapshot()
+    assert stub.requests == 2
+    assert stats['hedges'] == 1
+    assert stats['hedge_wins'] == 1
+    assert stats['retries'] == 0
+    assert stats['p50_ms'] < 800
+
+
+def test_no_hedge_when_primary_is_fast(stub):
+    client = make_client(stub, hedge_after=0.5)
+
+    client.generate('hello')
+
+    assert stub.requests == 1
+    assert client.stats.snapshot()['hedges'] == 0
+
+
+def test_reconnects_stale_pooled_connection_without_retry(stub):
+    import socket
+
+    client = make_client(stub)
+    client.generate('warm')
+    pooled = client._pool._idle.queue[-1]
+    pooled.sock.shutdown(socket.SHUT_RDWR)
+
+    assert extract_text(client.generate('hello')) == 'Stub reply.'
+    stats = client.stats.snapshot()
+    assert stats['retries'] == 0
+    assert stats['errors'] == {'stale_connection': 1}